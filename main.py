@@ -1,6 +1,12 @@
+import sys
+
 import wechatbot_client
+from wechatbot_client.exception import WeChatInitError
 
-wechatbot_client.init()
+try:
+    wechatbot_client.init()
+except WeChatInitError:
+    sys.exit(0)
 
 wechatbot_client.load("wechatbot_client.startup")
 
@@ -0,0 +1,170 @@
+"""
+action结果缓存，用来减少与com的交互次数
+"""
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Hashable, Optional, ParamSpec, TypeVar
+
+from .model import ActionResponse
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+_MISSING = object()
+"""缓存未命中标志"""
+CACHE_MAXSIZE = 1024
+"""缓存默认最大条目数"""
+SWEEP_INTERVAL = 256
+"""每写入多少次清理一次过期缓存"""
+
+
+class TTLCache:
+    """
+    带过期时间的缓存，定期清理过期缓存，超出最大条目数时淘汰最久未使用的缓存
+    """
+
+    _data: dict[Hashable, tuple[Any, float]]
+    """缓存数据: key -> (value, 过期时间)，按使用顺序排列"""
+    _maxsize: int
+    """最大条目数"""
+    _writes: int
+    """上次清理后的写入次数"""
+    _lock: threading.Lock
+    """action会在线程池中执行，需要加锁"""
+
+    def __init__(self, maxsize: int = CACHE_MAXSIZE) -> None:
+        self._data = {}
+        self._maxsize = maxsize
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        获取缓存，过期或不存在时返回`default`
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                self._data.pop(key, None)
+                return default
+            # 移到末尾，记录为最近使用
+            del self._data[key]
+            self._data[key] = item
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        """
+        设置缓存，`ttl`为有效时间，单位：秒
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, now + ttl)
+            self._writes += 1
+            if self._writes >= SWEEP_INTERVAL:
+                self._sweep(now)
+            if len(self._data) > self._maxsize:
+                # 最久未使用的缓存在最前面
+                del self._data[next(iter(self._data))]
+
+    def _sweep(self, now: float) -> None:
+        """
+        清理所有过期缓存，需要在锁内调用
+        """
+        self._writes = 0
+        data = self._data
+        for key in [key for key, (_, expires_at) in data.items() if expires_at < now]:
+            del data[key]
+
+    def update(self, key: Hashable, func: Callable[[Any], Any]) -> None:
+        """
+        用`func`更新未过期的缓存，读取与写入在同一次加锁内完成，保持原有的过期时间
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                self._data.pop(key, None)
+                return
+            self._data[key] = (func(value), expires_at)
+
+    def pop(self, key: Hashable) -> None:
+        """
+        删除缓存
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def pop_if(self, predicate: Callable[[Hashable], bool]) -> None:
+        """
+        删除所有满足条件的缓存
+        """
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        清空缓存
+        """
+        with self._lock:
+            self._data.clear()
+
+
+def make_cache_key(action_name: str, params: dict) -> tuple[str, frozenset]:
+    """
+    生成action缓存的key
+    """
+    return action_name, frozenset(params.items())
+
+
+def cache_action(ttl: float) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    """
+    说明:
+        使用此装饰器缓存action的返回数据，只缓存成功的结果，需要放在`standard_action`下方
+
+    参数:
+        * `ttl`: 缓存有效时间，单位：秒
+    """
+
+    def _cache(func: Callable[P, R]) -> Callable[P, R]:
+        action_name = func.__name__
+
+        @wraps(func)
+        def _wrapper(self, **kwargs) -> ActionResponse:
+            key = make_cache_key(action_name, kwargs)
+            data = self.action_cache.get(key, _MISSING)
+            if data is not _MISSING:
+                return ActionResponse(status="ok", retcode=0, data=data)
+            result: ActionResponse = func(self, **kwargs)
+            if result.status == "ok":
+                self.action_cache.set(key, result.data, ttl)
+            return result
+
+        return _wrapper
+
+    return _cache
+
+
+def invalidate_action(
+    cache: TTLCache, action_name: str, params: Optional[dict] = None
+) -> None:
+    """
+    说明:
+        使action缓存失效
+
+    参数:
+        * `cache`: 缓存
+        * `action_name`: action函数名
+        * `params`: action参数，为None时删除该action所有缓存
+    """
+    if params is not None:
+        cache.pop(make_cache_key(action_name, params))
+    else:
+        cache.pop_if(lambda key: key[0] == action_name)
@@ -1,27 +1,50 @@
+import asyncio
+import os
 import time
 from base64 import b64decode
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from inspect import iscoroutinefunction
 from pathlib import Path
-from sys import exit
 from typing import Callable, Literal, Optional, ParamSpec, TypeVar, Union
+from xml.etree import ElementTree as ET
 
 from pydantic import BaseModel
 
 from wechatbot_client.com_wechat import ComWechatApi
+from wechatbot_client.com_wechat import Message as WechatMessage
+from wechatbot_client.com_wechat.type import WxType
 from wechatbot_client.config import Config
 from wechatbot_client.consts import IMPL, ONEBOT_VERSION, PREFIX, VERSION
-from wechatbot_client.exception import FileNotFound, NoThisUserInGroup
+from wechatbot_client.exception import (
+    FileNotFound,
+    NoThisUserInGroup,
+    WeChatInitError,
+)
 from wechatbot_client.file_manager import FileCache, FileManager
+from wechatbot_client.log import is_log_enabled
 from wechatbot_client.onebot12 import Message, MessageSegment
 from wechatbot_client.utils import escape_tag, logger_wrapper
 
-from .check import expand_action, get_supported_actions, standard_action
-from .model import ActionResponse, BotSelf
+from .cache import TTLCache, cache_action, invalidate_action
+from .check import (
+    ACTION_DICT,
+    check_action_params,
+    expand_action,
+    get_supported_actions,
+    standard_action,
+)
+from .model import ActionRequest, ActionResponse, BatchCall, BotSelf
 
 log = logger_wrapper("Action Manager")
 P = ParamSpec("P")
 R = TypeVar("R")
 
+OK_EMPTY = ActionResponse(status="ok", retcode=0, data=None)
+"""无返回数据的成功响应，所有action共用，不要修改"""
+MEMBER_CACHE_TTL = 3600
+"""群成员列表缓存时间，单位：秒，成员变动由系统消息更新，这里只是兜底"""
+
 SEGMENT_HANDLER: dict[str, Callable[P, R]] = {}
 """消息段处理函数"""
 
@@ -50,54 +73,92 @@ class ApiManager:
     """文件管理器"""
     file_base_url: str
     """文件base url"""
+    action_cache: TTLCache
+    """action结果缓存"""
+    _member_cache: TTLCache
+    """群成员列表缓存: group_id -> 成员列表"""
+    _self_info: dict
+    """登录账号信息，登录后不会改变"""
+    _dispatch: dict[str, Callable[..., ActionResponse]]
+    """action分发表: 函数名 -> 绑定方法"""
+    _com_pool: Optional[ThreadPoolExecutor]
+    """com调用线程池，避免阻塞事件循环，`init`时创建"""
 
     def __init__(self) -> None:
         self.com_api = ComWechatApi()
         self.file_manager = None
+        self.action_cache = TTLCache()
+        self._member_cache = TTLCache()
+        self._self_info = None
+        # 只允许调用注册过的action，绑定方法只生成一次
+        self._dispatch = {
+            model.__name__: getattr(self, model.__name__)
+            for model in ACTION_DICT.values()
+        }
+        self._com_pool = None
 
     def init(self, file_manager: FileManager, config: Config) -> None:
         """
-        初始化com
+        说明:
+            初始化com
+
+        错误:
+            * `WeChatInitError`: 初始化失败
         """
         self.file_manager = file_manager
+        # 注入的dll未验证能否并发调用，默认只用一个线程
+        self._com_pool = ThreadPoolExecutor(
+            max_workers=config.com_thread_num,
+            thread_name_prefix="com",
+            initializer=self.com_api.init_thread,
+        )
         self.file_base_url = f"http://{config.host}:{config.port}/get_file/"
-        # 初始化com组件
-        log("DEBUG", "<y>初始化com组件...</y>")
-        if not self.com_api.init():
-            log("ERROR", "<r>未安装com组件，启动失败，请使用目录下`install.bat`安装组件...</r>")
-            exit(0)
-        log("DEBUG", "<g>com组件初始化成功...</g>")
+        # 查找微信进程与初始化com组件互不依赖，同时进行
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pid_future = executor.submit(self.com_api.find_wechat_pid)
+            # 初始化com组件，com对象需要在主线程创建
+            log("DEBUG", "<y>初始化com组件...</y>")
+            if not self.com_api.init():
+                log("ERROR", "<r>未安装com组件，启动失败，请使用目录下`install.bat`安装组件...</r>")
+                self.close()
+                raise WeChatInitError("未安装com组件")
+            log("DEBUG", "<g>com组件初始化成功...</g>")
+            wechat_pid = pid_future.result()
         # 启动微信进程
         log("DEBUG", "<y>正在初始化微信进程...</y>")
-        if not self.com_api.init_wechat_pid():
+        if not self.com_api.init_wechat_pid(wechat_pid):
             log("ERROR", "<r>微信进程启动失败...</r>")
-            self.com_api.close()
-            exit(0)
+            self.close()
+            raise WeChatInitError("微信进程启动失败")
         log("DEBUG", "<g>找到微信进程...</g>")
         # 注入dll
         log("DEBUG", "<y>正在注入微信...</y>")
         if not self.com_api.start_service():
             log("ERROR", "<r>微信进程启动失败...</r>")
-            self.com_api.close()
-            exit(0)
+            self.close()
+            raise WeChatInitError("dll注入失败")
         log("SUCCESS", "<g>dll注入成功...</g>")
         # 等待登录
         log("INFO", "<y>等待登录...</y>")
         if not self.wait_for_login():
             log("INFO", "<g>进程关闭...</g>")
-            self.com_api.close()
-            exit(0)
+            self.close()
+            raise WeChatInitError("未登录")
         log("SUCCESS", "<g>登录完成...</g>")
+        # 缓存自身信息
+        self._self_info = self.com_api.get_self_info()
 
     def wait_for_login(self) -> bool:
         """
-        等待登录
+        等待登录，轮询间隔从0.05秒开始逐渐增加到2秒
         """
+        delay = 0.05
         while True:
             try:
                 if self.com_api.is_wechat_login():
                     return True
-                time.sleep(1)
+                time.sleep(delay)
+                delay = min(delay * 1.5, 2.0)
             except KeyboardInterrupt:
                 return False
 
@@ -114,15 +175,13 @@ class ApiManager:
             log("ERROR", "<r>启动消息hook失败...</r>")
         log("DEBUG", "<g>启动消息hook成功...</g>")
         # 启动图片hook
-        file = Path(file_path)
-        img_file = file / "image"
-        result = self.com_api.hook_image_msg(str(img_file.absolute()))
+        file = os.fspath(Path(file_path).resolve(strict=False))
+        result = self.com_api.hook_image_msg(file + os.sep + "image")
         if not result:
             log("ERROR", "<r>启动图片hook失败...</r>")
         log("DEBUG", "<g>启动图片hook成功...</g>")
         # 启动语音hook
-        voice_file = file / "voice"
-        result = self.com_api.hook_voice_msg(str(voice_file.absolute()))
+        result = self.com_api.hook_voice_msg(file + os.sep + "voice")
         if not result:
             log("ERROR", "<r>启动语音hook失败...</r>")
         log("DEBUG", "<g>启动语音hook成功...</g>")
@@ -131,13 +190,15 @@ class ApiManager:
         """
         关闭
         """
+        if self._com_pool is not None:
+            self._com_pool.shutdown(wait=False, cancel_futures=True)
         self.com_api.close()
 
     def get_info(self) -> dict:
         """
         获取自身信息
         """
-        return self.com_api.get_self_info()
+        return self._self_info
 
     async def request(
         self, action_name: str, action_model: BaseModel
@@ -153,20 +214,31 @@ class ApiManager:
         返回:
             * `response`: action返回值
         """
-        func = getattr(self, action_name)
+        # action已经过`check_action_params`校验，分发表中一定存在
+        func = self._dispatch[action_name]
         try:
             if iscoroutinefunction(func):
                 result = await func(**action_model.dict())
             else:
-                result = func(**action_model.dict())
+                result = await self._run_com(func, **action_model.dict())
         except Exception as e:
             log("ERROR", f"<r>调用api错误: {e}</r>")
             return ActionResponse(
                 status="failed", retcode=20002, message="内部服务错误", data=None
             )
-        log("DEBUG", f"<g>调用api成功，返回:</g> {escape_tag(str(result))}")
+        if is_log_enabled("DEBUG"):
+            log("DEBUG", f"<g>调用api成功，返回:</g> {escape_tag(str(result))}")
         return result
 
+    async def _run_com(self, func: Callable[P, R], *args, **kwargs) -> R:
+        """
+        在com线程池中执行同步函数
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._com_pool, partial(func, *args, **kwargs)
+        )
+
     def register_message_handler(self, func: Callable[[str], None]) -> None:
         """注册一个消息处理器"""
         self.com_api.register_message_handler(func)
@@ -195,7 +267,7 @@ class ApiManager:
         file_path, _ = await self.file_manager.get_file(file_id)
         if file_path is None:
             raise FileNotFound(file_id)
-        return self.com_api.send_image(id, file_path)
+        return await self._run_com(self.com_api.send_image, id, file_path)
 
     @add_segment_handler("file")
     async def _send_file(self, id: str, segment: MessageSegment) -> bool:
@@ -204,7 +276,7 @@ class ApiManager:
         file_path, _ = await self.file_manager.get_file(file_id)
         if file_path is None:
             raise FileNotFound(file_id)
-        return self.com_api.send_file(id, file_path)
+        return await self._run_com(self.com_api.send_file, id, file_path)
 
     @add_segment_handler(f"{PREFIX}.emoji")
     async def _send_emoji(self, id: str, segment: MessageSegment) -> bool:
@@ -213,7 +285,7 @@ class ApiManager:
         file_path, _ = await self.file_manager.get_file(file_id)
         if file_path is None:
             raise FileNotFound(file_id)
-        return self.com_api.send_gif(id, file_path)
+        return await self._run_com(self.com_api.send_gif, id, file_path)
 
     @add_segment_handler(f"{PREFIX}.link")
     async def _send_link(self, id: str, segment: MessageSegment) -> bool:
@@ -227,7 +299,9 @@ class ApiManager:
         title = segment.data["title"]
         des = segment.data["des"]
         url = segment.data["url"]
-        return self.com_api.send_message_card(id, title, des, url, file_path)
+        return await self._run_com(
+            self.com_api.send_message_card, id, title, des, url, file_path
+        )
 
 
 class ActionManager(ApiManager):
@@ -235,6 +309,25 @@ class ActionManager(ApiManager):
     action管理器，实现所有action
     """
 
+    def prefetch(self) -> None:
+        """
+        说明:
+            在后台预取好友列表和群列表，使首次请求直接命中缓存
+        """
+        self._com_pool.submit(self._prefetch_contacts)
+
+    def _prefetch_contacts(self) -> None:
+        """
+        预取通讯录，好友列表与群列表共用通讯录缓存，顺序执行只需一次com调用
+        """
+        try:
+            self.get_friend_list()
+            self.get_group_list()
+        except Exception as e:
+            log("ERROR", f"<r>预取通讯录失败: {e}</r>")
+            return
+        log("DEBUG", "<g>通讯录预取完成...</g>")
+
     @standard_action
     def get_supported_actions(self) -> ActionResponse:
         """
@@ -362,7 +455,7 @@ class ActionManager(ApiManager):
                 if iscoroutinefunction(handler):
                     await handler(self, user_id, segment)
                 else:
-                    handler(self, user_id, segment)
+                    await self._run_com(handler, self, user_id, segment)
             except FileNotFound as e:
                 log("ERROR", repr(e))
                 exceptions.append("无效的file_id")
@@ -377,7 +470,7 @@ class ActionManager(ApiManager):
             return ActionResponse(
                 status="failed", retcode=10002, data=None, message=msg
             )
-        return ActionResponse(status="ok", retcode=0, data=None)
+        return OK_EMPTY
 
     async def _send_group_msg(self, message: Message, group_id: str) -> ActionResponse:
         """
@@ -385,7 +478,9 @@ class ActionManager(ApiManager):
         """
         exceptions: list[str] = []
         try:
-            all_at_list, message = self._pre_handle_msg(group_id, message)
+            all_at_list, message = await self._run_com(
+                self._pre_handle_msg, group_id, message
+            )
         except NoThisUserInGroup as e:
             log("ERROR", repr(e))
             return ActionResponse(
@@ -402,11 +497,11 @@ class ActionManager(ApiManager):
                         at_list = None
                     else:
                         at_list = all_at_list.pop(0)
-                    handler(self, group_id, segment, at_list)
+                    await self._run_com(handler, self, group_id, segment, at_list)
                 elif iscoroutinefunction(handler):
                     await handler(self, group_id, segment)
                 else:
-                    handler(self, group_id, segment)
+                    await self._run_com(handler, self, group_id, segment)
             except FileNotFound as e:
                 log("ERROR", repr(e))
                 exceptions.append("无效的file_id")
@@ -421,14 +516,14 @@ class ActionManager(ApiManager):
             return ActionResponse(
                 status="failed", retcode=10002, data=None, message=msg
             )
-        return ActionResponse(status="ok", retcode=0, data=None)
+        return OK_EMPTY
 
     @standard_action
     def get_self_info(self) -> ActionResponse:
         """
         获取机器人自身信息
         """
-        info = self.com_api.get_self_info()
+        info = self._self_info
         data = {
             "user_id": info["wxId"],
             "user_name": info["wxNickName"],
@@ -440,6 +535,7 @@ class ActionManager(ApiManager):
         return ActionResponse(status="ok", retcode=0, data=data)
 
     @standard_action
+    @cache_action(ttl=60)
     def get_user_info(self, user_id: str) -> ActionResponse:
         """
         获取用户信息
@@ -459,6 +555,7 @@ class ActionManager(ApiManager):
         return ActionResponse(status="ok", retcode=0, data=data)
 
     @standard_action
+    @cache_action(ttl=600)
     def get_friend_list(self) -> ActionResponse:
         """
         获取好友列表
@@ -477,6 +574,7 @@ class ActionManager(ApiManager):
         return ActionResponse(status="ok", retcode=0, data=data)
 
     @standard_action
+    @cache_action(ttl=60)
     def get_group_info(self, group_id: str) -> ActionResponse:
         """
         获取群信息
@@ -492,6 +590,7 @@ class ActionManager(ApiManager):
         return ActionResponse(status="ok", retcode=0, data=data)
 
     @standard_action
+    @cache_action(ttl=600)
     def get_group_list(self) -> ActionResponse:
         """
         获取群列表
@@ -506,32 +605,106 @@ class ActionManager(ApiManager):
         ]
         return ActionResponse(status="ok", retcode=0, data=data)
 
+    def _get_group_members(self, group_id: str) -> list[dict]:
+        """
+        获取群成员列表，优先使用缓存
+        """
+        members = self._member_cache.get(group_id)
+        if members is None:
+            res = self.com_api.get_group_members(group_id)
+            members = res["members"]
+            self._member_cache.set(group_id, members, MEMBER_CACHE_TTL)
+        return members
+
+    async def update_group_members(self, msg: WechatMessage) -> None:
+        """
+        说明:
+            根据群成员变动的系统消息更新群成员缓存，无法解析的变动会使缓存失效
+
+        参数:
+            * `msg`: 微信消息
+        """
+        if msg.type not in (WxType.SYSTEM_NOTICE, WxType.SYSTEM_MSG):
+            return
+        if not msg.is_group:
+            return
+        group_id = msg.sender
+        members = self._member_cache.get(group_id)
+        if members is None:
+            return
+        if msg.type == WxType.SYSTEM_NOTICE:
+            # 文本提示只有昵称，无法对应wxid
+            if "群聊" in msg.message and ("加入" in msg.message or "移出" in msg.message):
+                self._member_cache.pop(group_id)
+            return
+        try:
+            xml_obj = ET.fromstring(msg.message)
+        except ET.ParseError:
+            return
+        if xml_obj.attrib.get("type") != "sysmsgtemplate":
+            return
+        template = xml_obj.findtext("./sysmsgtemplate/content_template/template", "")
+        links = {
+            link.attrib.get("name"): [
+                one.text for one in link.iterfind("./memberlist/member/username")
+            ]
+            for link in xml_obj.iterfind(
+                "./sysmsgtemplate/content_template/link_list/link"
+            )
+        }
+        if "加入" in template:
+            joined = links.get("names", []) + links.get("adder", [])
+            if not joined:
+                self._member_cache.pop(group_id)
+                return
+            exists = {one["wxId"] for one in members}
+            new_members = [
+                await self._run_com(self.com_api.get_user_info, wxid)
+                for wxid in joined
+                if wxid and wxid not in exists
+            ]
+            if not new_members:
+                return
+
+            def _add(current: list) -> list:
+                # 获取信息期间缓存可能已被修改，基于最新的列表合并
+                current_ids = {one["wxId"] for one in current}
+                return current + [
+                    one for one in new_members if one["wxId"] not in current_ids
+                ]
+
+            self._member_cache.update(group_id, _add)
+        elif "移出" in template:
+            removed = set(links.get("kickoutname", []))
+            if not removed:
+                self._member_cache.pop(group_id)
+                return
+            self._member_cache.update(
+                group_id,
+                lambda current: [one for one in current if one["wxId"] not in removed],
+            )
+
     @standard_action
     def get_group_member_info(self, group_id: str, user_id: str) -> ActionResponse:
         """
         获取群成员信息
         """
-        res = self.com_api.get_group_members(group_id)
-        members = res["members"]
-        flag = False
-        for one in members:
-            if one["wxId"] == user_id:
-                data = {
-                    "user_id": one["wxId"],
-                    "user_name": one["wxNickName"],
-                    "user_displayname": "",
-                    f"{PREFIX}.avatar": one["wxBigAvatar"],  # 头像
-                    f"{PREFIX}.wx_number": one["wxNumber"],  # 微信号
-                    f"{PREFIX}.nation": one["wxNation"],  # 国家
-                    f"{PREFIX}.province": one["wxProvince"],  # 省份
-                    f"{PREFIX}.city": one["wxCity"],  # 城市
-                }
-                flag = True
-                break
-        if not flag:
+        members = self._get_group_members(group_id)
+        one = next((one for one in members if one["wxId"] == user_id), None)
+        if one is None:
             return ActionResponse(
                 status="failed", retcode=35001, data=None, message="群内没有该联系人"
             )
+        data = {
+            "user_id": one["wxId"],
+            "user_name": one["wxNickName"],
+            "user_displayname": "",
+            f"{PREFIX}.avatar": one["wxBigAvatar"],  # 头像
+            f"{PREFIX}.wx_number": one["wxNumber"],  # 微信号
+            f"{PREFIX}.nation": one["wxNation"],  # 国家
+            f"{PREFIX}.province": one["wxProvince"],  # 省份
+            f"{PREFIX}.city": one["wxCity"],  # 城市
+        }
         return ActionResponse(status="ok", retcode=0, data=data)
 
     @standard_action
@@ -539,8 +712,7 @@ class ActionManager(ApiManager):
         """
         获取群成员列表
         """
-        res = self.com_api.get_group_members(group_id)
-        members = res["members"]
+        members = self._get_group_members(group_id)
         data = [
             {
                 "user_id": one["wxId"],
@@ -563,7 +735,11 @@ class ActionManager(ApiManager):
         """
         res = self.com_api.set_group_name(group_id, group_name)
         if res:
-            return ActionResponse(status="ok", retcode=0, data=None)
+            invalidate_action(self.action_cache, "get_group_list")
+            invalidate_action(
+                self.action_cache, "get_group_info", {"group_id": group_id}
+            )
+            return OK_EMPTY
         else:
             return ActionResponse(
                 status="failed", retcode=35000, data=None, message="操作失败"
@@ -675,7 +851,7 @@ class ActionManager(ApiManager):
         """
         status = self.com_api.follow_public_number(user_id)
         if status:
-            return ActionResponse(status="ok", retcode=0, data=None)
+            return OK_EMPTY
         else:
             return ActionResponse(
                 status="failed", retcode=35000, data=None, message="操作失败"
@@ -793,7 +969,7 @@ class ActionManager(ApiManager):
         """
         status = self.com_api.backup_db(handle, file_path)
         if status:
-            return ActionResponse(status="ok", retcode=0, data=None)
+            return OK_EMPTY
         else:
             return ActionResponse(
                 status="failed", retcode=32000, data=None, message="备份数据库失败"
@@ -811,7 +987,7 @@ class ActionManager(ApiManager):
         """
         status = self.com_api.verify_friend_apply(v3, v4)
         if status:
-            return ActionResponse(status="ok", retcode=0, data=None)
+            return OK_EMPTY
         else:
             return ActionResponse(
                 status="failed", retcode=35000, data=None, message="操作失败"
@@ -836,7 +1012,7 @@ class ActionManager(ApiManager):
         """
         status = self.com_api.change_wechat_version(version)
         if status:
-            return ActionResponse(status="ok", retcode=0, data=None)
+            return OK_EMPTY
         else:
             return ActionResponse(
                 status="failed", retcode=35000, data=None, message="操作失败"
@@ -850,7 +1026,8 @@ class ActionManager(ApiManager):
         status = self.com_api.delete_friend(user_id)
         if status:
             self.com_api.get_contacts()
-            return ActionResponse(status="ok", retcode=0, data=None)
+            invalidate_action(self.action_cache, "get_friend_list")
+            return OK_EMPTY
         else:
             return ActionResponse(
                 status="failed", retcode=35000, data=None, message="操作失败"
@@ -869,7 +1046,10 @@ class ActionManager(ApiManager):
         status = self.com_api.edit_remark(user_id, remark)
         if status:
             self.com_api.get_contacts()
-            return ActionResponse(status="ok", retcode=0, data=None)
+            invalidate_action(self.action_cache, "get_friend_list")
+            invalidate_action(self.action_cache, "get_group_list")
+            invalidate_action(self.action_cache, "get_user_info", {"user_id": user_id})
+            return OK_EMPTY
         else:
             return ActionResponse(
                 status="failed", retcode=35000, data=None, message="操作失败"
@@ -885,7 +1065,7 @@ class ActionManager(ApiManager):
         status = self.com_api.set_group_announcement(group_id, announcement)
         if status:
             self.com_api.get_contacts()
-            return ActionResponse(status="ok", retcode=0, data=None)
+            return OK_EMPTY
         else:
             return ActionResponse(
                 status="failed", retcode=35000, data=None, message="操作失败"
@@ -900,7 +1080,7 @@ class ActionManager(ApiManager):
         status = self.com_api.set_group_nickname(group_id, nickname)
         if status:
             self.com_api.get_contacts()
-            return ActionResponse(status="ok", retcode=0, data=None)
+            return OK_EMPTY
         else:
             return ActionResponse(
                 status="failed", retcode=35000, data=None, message="操作失败"
@@ -930,7 +1110,8 @@ class ActionManager(ApiManager):
         status = self.com_api.delete_groupmember(group_id, user_list)
         if status:
             self.com_api.get_contacts()
-            return ActionResponse(status="ok", retcode=0, data=None)
+            self._member_cache.pop(group_id)
+            return OK_EMPTY
         else:
             return ActionResponse(
                 status="failed", retcode=35000, data=None, message="操作失败"
@@ -951,7 +1132,8 @@ class ActionManager(ApiManager):
         status = self.com_api.add_groupmember(group_id, user_list)
         if status:
             self.com_api.get_contacts()
-            return ActionResponse(status="ok", retcode=0, data=None)
+            self._member_cache.pop(group_id)
+            return OK_EMPTY
         else:
             return ActionResponse(
                 status="failed", retcode=35000, data=None, message="操作失败"
@@ -983,7 +1165,7 @@ class ActionManager(ApiManager):
         status = self.com_api.send_forward_msg(user_id, message_id)
         if status:
             self.com_api.get_contacts()
-            return ActionResponse(status="ok", retcode=0, data=None)
+            return OK_EMPTY
         else:
             return ActionResponse(
                 status="failed", retcode=35000, data=None, message="操作失败"
@@ -1005,7 +1187,7 @@ class ActionManager(ApiManager):
         status = self.com_api.send_xml(user_id, xml, image_path)
         if status:
             self.com_api.get_contacts()
-            return ActionResponse(status="ok", retcode=0, data=None)
+            return OK_EMPTY
         else:
             return ActionResponse(
                 status="failed", retcode=35000, data=None, message="操作失败"
@@ -1019,7 +1201,7 @@ class ActionManager(ApiManager):
         status = self.com_api.send_contact_card(user_id, card_id, nickname)
         if status:
             self.com_api.get_contacts()
-            return ActionResponse(status="ok", retcode=0, data=None)
+            return OK_EMPTY
         else:
             return ActionResponse(
                 status="failed", retcode=35000, data=None, message="操作失败"
@@ -1036,3 +1218,93 @@ class ActionManager(ApiManager):
         """
         nums = await self.file_manager.clean_cache(days)
         return ActionResponse(status="ok", retcode=0, data=nums)
+
+    @expand_action
+    async def batch(
+        self, calls: list[BatchCall], concurrent: bool = False
+    ) -> ActionResponse:
+        """
+        说明:
+            批量调用action，返回每个调用的结果
+            默认按顺序执行；`concurrent`为True时按`input_from`的依赖关系分层，同一层的调用并发执行
+
+        参数:
+            * `calls`: 调用列表，`input_from`不为-1时，会将对应调用返回的`data`填入`input_param`参数
+            * `concurrent`: 是否并发执行没有依赖关系的调用. 默认为False.
+        """
+        # 参数模型经过`dict()`后传入，这里重新转为模型
+        calls = [BatchCall.parse_obj(call) for call in calls]
+        if not concurrent:
+            responses: list[ActionResponse] = []
+            for index, call in enumerate(calls):
+                responses.append(await self._batch_call(index, call, responses))
+            return ActionResponse(
+                status="ok", retcode=0, data=[one.dict() for one in responses]
+            )
+        depths: list[int] = []
+        layers: list[list[int]] = []
+        for index, call in enumerate(calls):
+            if 0 <= call.input_from < index:
+                depth = depths[call.input_from] + 1
+            else:
+                depth = 0
+            depths.append(depth)
+            if depth == len(layers):
+                layers.append([])
+            layers[depth].append(index)
+        responses = [None] * len(calls)
+        for layer in layers:
+            results = await asyncio.gather(
+                *(self._batch_call(index, calls[index], responses) for index in layer)
+            )
+            for index, result in zip(layer, results):
+                responses[index] = result
+        return ActionResponse(
+            status="ok", retcode=0, data=[one.dict() for one in responses]
+        )
+
+    async def _batch_call(
+        self, index: int, call: BatchCall, responses: list[ActionResponse]
+    ) -> ActionResponse:
+        """
+        执行批量请求中的单个调用
+        """
+        if call.action == f"{PREFIX}.batch":
+            return ActionResponse(
+                status="failed", retcode=10003, data=None, message="不支持嵌套batch"
+            )
+        params = dict(call.params)
+        if call.input_from != -1:
+            if not 0 <= call.input_from < index or call.input_param is None:
+                return ActionResponse(
+                    status="failed", retcode=10003, data=None, message="引用参数错误"
+                )
+            depend = responses[call.input_from]
+            if depend.status != "ok":
+                return ActionResponse(
+                    status="failed", retcode=10003, data=None, message="引用的调用失败"
+                )
+            data = depend.data
+            if call.input_key is not None:
+                if not isinstance(data, dict) or call.input_key not in data:
+                    return ActionResponse(
+                        status="failed", retcode=10003, data=None, message="引用字段不存在"
+                    )
+                data = data[call.input_key]
+            params[call.input_param] = data
+        try:
+            action_name, action_model = check_action_params(
+                ActionRequest(action=call.action, params=params)
+            )
+        except TypeError:
+            return ActionResponse(
+                status="failed",
+                retcode=10002,
+                data=None,
+                message=f"未实现的action: {call.action}",
+            )
+        except ValueError:
+            return ActionResponse(
+                status="failed", retcode=10003, data=None, message="Param参数错误"
+            )
+        return await self.request(action_name, action_model)
@@ -32,6 +32,21 @@ class WsActionRequest(ActionRequest):
     """ws请求echo"""
 
 
+class BatchCall(BaseModel, extra=Extra.forbid):
+    """批量请求中的单个调用"""
+
+    action: str
+    """请求方法"""
+    params: dict = {}
+    """请求参数"""
+    input_from: int = -1
+    """引用第几个调用的返回数据，-1表示不引用"""
+    input_param: Optional[str] = None
+    """引用的返回数据填入的参数名"""
+    input_key: Optional[str] = None
+    """只引用返回数据中的某个字段，为None时引用整个返回数据"""
+
+
 class ActionResponse(BaseModel, extra=Extra.forbid):
     """action回复"""
 
@@ -1,11 +1,14 @@
 import asyncio
 import json
+import threading
 from pathlib import Path
 from typing import Callable, Literal, Optional, Tuple, Union
 
+import comtypes
 import psutil
 from comtypes.client import CreateObject, GetEvents
 
+from wechatbot_client.log import is_log_enabled
 from wechatbot_client.utils import escape_tag, logger_wrapper
 
 log = logger_wrapper("Com WeChat")
@@ -21,7 +24,8 @@ class MessageReporter:
 
     def OnGetMessageEvent(self, message: Tuple[str, None]):
         msg = message[0]
-        log("DEBUG", f"<g>接收到wechat消息</g> - {escape_tag(msg)}")
+        if is_log_enabled("DEBUG"):
+            log("DEBUG", f"<g>接收到wechat消息</g> - {escape_tag(msg)}")
         if self.func:
             asyncio.create_task(self.func(msg))
 
@@ -35,8 +39,10 @@ class ComProgress:
     com通讯组件
     """
 
-    robot = None
-    """com通讯robot"""
+    _robot = None
+    """主线程的com通讯robot"""
+    _local: threading.local
+    """工作线程各自的com通讯robot"""
     event = None
     """com通讯event"""
     com_pid: int
@@ -49,7 +55,8 @@ class ComProgress:
     """消息接收器"""
 
     def __init__(self) -> None:
-        self.robot = None
+        self._robot = None
+        self._local = threading.local()
         self.event = None
         self.com_pid = None
         self.wechat_pid = None
@@ -61,13 +68,25 @@ class ComProgress:
         初始化com组件
         """
         try:
-            self.robot = CreateObject("WeChatRobot.CWeChatRobot")
+            self._robot = CreateObject("WeChatRobot.CWeChatRobot")
             self.event = CreateObject("WeChatRobot.RobotEvent")
-            self.com_pid = self.robot.CStopRobotService(0)
+            self.com_pid = self._robot.CStopRobotService(0)
         except OSError:
             return False
         return True
 
+    def init_thread(self) -> None:
+        """
+        初始化工作线程的com环境，com对象不能跨线程使用，每个线程需要单独创建
+        """
+        comtypes.CoInitialize()
+        self._local.robot = CreateObject("WeChatRobot.CWeChatRobot")
+
+    @property
+    def robot(self):
+        """com通讯robot，工作线程中使用线程自己的robot"""
+        return getattr(self._local, "robot", self._robot)
+
     def close(self) -> None:
         """
         关闭com进程
@@ -102,25 +121,35 @@ class ComWechatApi(ComProgress):
     AddressBook: list[dict] = None
     """通讯录列表"""
 
-    def init_wechat_pid(self) -> bool:
+    def find_wechat_pid(self) -> Optional[int]:
         """
         说明:
-            初始化微信，并获取pid
+            查找已开的微信进程，不涉及com调用
 
         返回:
-            是否成功
+            * `int | None`: 微信pid，未找到为None
         """
-        # 查找已开微信进程
-        pid_list = []
-        process_list = psutil.pids()
-        for pid in process_list:
+        for pid in psutil.pids():
             try:
                 if psutil.Process(pid).name() == "WeChat.exe":
-                    pid_list.append(pid)
+                    return pid
             except psutil.NoSuchProcess:
                 pass
-        if pid_list:
-            self.wechat_pid = pid_list[0]
+        return None
+
+    def init_wechat_pid(self, pid: Optional[int] = None) -> bool:
+        """
+        说明:
+            初始化微信，并获取pid
+
+        参数:
+            * `pid`: 已开微信进程的pid，为None时自己启动微信
+
+        返回:
+            是否成功
+        """
+        if pid is not None:
+            self.wechat_pid = pid
             return True
         # 自己启动微信
         pid = self.start_wechat()
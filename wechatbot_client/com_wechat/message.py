@@ -1,14 +1,15 @@
 """
 这里将comwechat收到的message解析为event
 """
+import ntpath
 import re
 from inspect import iscoroutinefunction
+from os import urandom
 from pathlib import Path
-from typing import Callable, Generic, Optional, ParamSpec, TypeVar
+from typing import Callable, Generic, Optional, ParamSpec, TypeVar, Union
 from urllib.parse import unquote
-from uuid import uuid4
-from xml.etree import ElementTree as ET
 from xml.etree.ElementTree import Element
+from xml.parsers import expat
 
 from wechatbot_client.file_manager import FileManager
 from wechatbot_client.onebot12 import Message, MessageSegment
@@ -35,17 +36,39 @@ from wechatbot_client.onebot12.event import (
 from .model import Message as WechatMessage
 from .type import AppType, SysmsgType, WxType
 
+try:
+    from lxml import etree as ET
+
+    _XML_PARSER = ET.XMLParser(resolve_entities=False)
+    """lxml解析器，不解析实体"""
+except ImportError:
+    from xml.etree import ElementTree as ET
+
+    _XML_PARSER = None
+
+_AT_RE = re.compile(r"(@[^@\s]+\s)")
+"""文本中at的正则"""
+_MENTION_ALL = MessageSegment.mention_all()
+"""at全体消息段，不含可变数据，所有消息共用"""
+
 E = TypeVar("E", bound=Event)
 P = ParamSpec("P")
-
-HANDLE_DICT: dict[int, Callable[P, E]] = {}
-"""消息处理器字典"""
-APP_HANDLERS: dict[int, Callable[P, Optional[E]]] = {}
-"""app消息处理函数字典"""
+T = TypeVar("T")
+MessageEvent = Union[GroupMessageEvent, PrivateMessageEvent]
+"""消息事件"""
+
+HANDLE_DICT: dict[int, tuple[bool, Callable[P, E]]] = {}
+"""消息处理器字典: type -> (是否为协程函数, 处理器)"""
+APP_HANDLERS: dict[int, tuple[bool, Callable[P, Optional[E]]]] = {}
+"""app消息处理函数字典: type -> (是否为协程函数, 处理函数)"""
 SYS_MSG_HANDLERS: dict[str, Callable[P, Optional[E]]] = {}
 """系统消息处理函数字典"""
-SYS_NOTICE_HANDLERS: list[Callable[P, Optional[E]]] = []
-"""系统通知处理函数列表"""
+SYS_NOTICE_HANDLERS: dict[str, Callable[P, Optional[E]]] = {}
+"""系统通知处理函数字典，按消息内容完全匹配"""
+SYS_NOTICE_MATCHERS: list[tuple[Callable[[str], bool], Callable[P, Optional[E]]]] = []
+"""系统通知处理函数列表，按条件匹配"""
+DENSE_TYPE_LIMIT = 256
+"""小于此值的type使用列表下标查找，其余的稀疏type回退到字典"""
 
 
 def add_handler(_tpye: int) -> Callable[P, E]:
@@ -55,7 +78,7 @@ def add_handler(_tpye: int) -> Callable[P, E]:
 
     def _handle(func: Callable[P, E]) -> Callable[P, E]:
         global HANDLE_DICT
-        HANDLE_DICT[_tpye] = func
+        HANDLE_DICT[_tpye] = (iscoroutinefunction(func), func)
         return func
 
     return _handle
@@ -68,7 +91,7 @@ def add_app_handler(_tpye: int) -> Callable[P, Optional[E]]:
 
     def _handle(func: Callable[P, Optional[E]]) -> Callable[P, Optional[E]]:
         global APP_HANDLERS
-        APP_HANDLERS[_tpye] = func
+        APP_HANDLERS[_tpye] = (iscoroutinefunction(func), func)
         return func
 
     return _handle
@@ -85,11 +108,145 @@ def add_sys_msg_handler(_tpye: str) -> Callable[P, Optional[E]]:
     return _handle
 
 
-def add_sys_notice_handler(func: Callable[P, Optional[E]]) -> Callable[P, Optional[E]]:
-    """添加系统处理器"""
-    global SYS_NOTICE_HANDLERS
-    SYS_NOTICE_HANDLERS.append(func)
-    return func
+def add_sys_notice_handler(
+    match: Union[str, Callable[[str], bool]]
+) -> Callable[P, Optional[E]]:
+    """
+    说明:
+        添加系统通知处理器
+
+    参数:
+        * `match`: 为str时完全匹配消息内容，为函数时按其返回值匹配
+    """
+
+    def _handle(func: Callable[P, Optional[E]]) -> Callable[P, Optional[E]]:
+        global SYS_NOTICE_HANDLERS, SYS_NOTICE_MATCHERS
+        if isinstance(match, str):
+            SYS_NOTICE_HANDLERS[match] = func
+        else:
+            SYS_NOTICE_MATCHERS.append((match, func))
+        return func
+
+    return _handle
+
+
+def _build_table(handlers: dict[int, T]) -> list[Optional[T]]:
+    """
+    将处理器字典中较小的type展开为列表，需在所有处理器注册完成后调用
+    """
+    size = max((key for key in handlers if key < DENSE_TYPE_LIMIT), default=-1) + 1
+    table: list[Optional[T]] = [None] * size
+    for key, value in handlers.items():
+        if key < size:
+            table[key] = value
+    return table
+
+
+def _event_id() -> str:
+    """
+    生成事件id，省去构造UUID对象的开销
+    """
+    return urandom(16).hex()
+
+
+def _children(elem: Element) -> dict[str, Element]:
+    """
+    一次遍历取得所有子节点，替代多次`find`；同名子节点取第一个，与`find`一致
+    """
+    return {child.tag: child for child in reversed(elem)}
+
+
+def _scan_app_type(raw_xml: str) -> Optional[int]:
+    """
+    不解析xml，直接在文本中查找`appmsg`下第一个`type`，找不到时返回None
+    """
+    start = raw_xml.find("<appmsg")
+    if start == -1:
+        return None
+    start = raw_xml.find("<type>", start)
+    if start == -1:
+        return None
+    start += 6
+    end = raw_xml.find("</type>", start)
+    try:
+        return int(raw_xml[start:end])
+    except ValueError:
+        return None
+
+
+class _StopParse(Exception):
+    """读取到根节点后中止解析"""
+
+
+def _root_attrib(raw_xml: str) -> dict[str, str]:
+    """
+    只读取根节点的属性，读到根节点后即停止解析，不构建元素树
+    """
+    parser = expat.ParserCreate()
+    attrib: dict[str, str] = {}
+
+    def _start(name: str, attrs: dict[str, str]) -> None:
+        attrib.update(attrs)
+        raise _StopParse
+
+    parser.StartElementHandler = _start
+    try:
+        parser.Parse(raw_xml, True)
+    except _StopParse:
+        pass
+    return attrib
+
+
+def _parse_xml(raw_xml: str) -> Element:
+    """
+    解析xml，优先使用lxml
+    """
+    if _XML_PARSER is None:
+        return ET.fromstring(raw_xml)
+    # lxml不支持带编码声明的str，这里转为bytes
+    return ET.fromstring(raw_xml.encode("utf-8"), _XML_PARSER)
+
+
+def _build_msg_event(
+    msg: WechatMessage,
+    message: Message,
+    event_id: Optional[str] = None,
+    alt_message: Optional[str] = None,
+) -> MessageEvent:
+    """
+    说明:
+        根据消息来源生成群聊或私聊消息事件
+
+    参数:
+        * `msg`: 微信消息
+        * `message`: 消息内容
+        * `event_id`: 事件id，为None时自动生成
+        * `alt_message`: 替代表示，为None时由`message`生成
+    """
+    if event_id is None:
+        event_id = _event_id()
+    if alt_message is None:
+        alt_message = str(message)
+    if msg.is_group:
+        return GroupMessageEvent(
+            id=event_id,
+            time=msg.timestamp,
+            self=BotSelf(user_id=msg.self),
+            message_id=str(msg.msgid),
+            message=message,
+            alt_message=alt_message,
+            user_id=msg.wxid,
+            group_id=msg.sender,
+        )
+    return PrivateMessageEvent(
+        id=event_id,
+        time=msg.timestamp,
+        self=BotSelf(user_id=msg.self),
+        message_id=str(msg.msgid),
+        message=message,
+        alt_message=alt_message,
+        user_id=msg.wxid,
+    )
 
 
 class MessageHandler(Generic[E]):
@@ -105,6 +262,12 @@ class MessageHandler(Generic[E]):
     """微信文件路径"""
     file_manager: FileManager
     """文件处理器"""
+    _image_dir: str
+    """图片文件绝对路径"""
+    _voice_dir: str
+    """语音文件路径"""
+    _wechat_dir: str
+    """微信文件路径"""
 
     def __init__(
         self,
@@ -117,16 +280,23 @@ class MessageHandler(Generic[E]):
         self.voice_path = voice_path
         self.wechat_path = wechat_path
         self.file_manager = file_manager
+        self._image_dir = str(image_path.absolute())
+        self._voice_dir = str(voice_path)
+        self._wechat_dir = str(wechat_path)
 
     async def message_to_event(self, msg: WechatMessage) -> Optional[E]:
         """
         处理消息，返回事件
         """
         _type = msg.type
-        handler = HANDLE_DICT.get(_type)
-        if handler is None:
+        if 0 <= _type < len(_HANDLE_TABLE):
+            entry = _HANDLE_TABLE[_type]
+        else:
+            entry = HANDLE_DICT.get(_type)
+        if entry is None:
             return None
-        if iscoroutinefunction(handler):
+        is_coroutine, handler = entry
+        if is_coroutine:
             result = await handler(self, msg)
         else:
             result = handler(self, msg)
@@ -139,111 +309,63 @@ class MessageHandler(Generic[E]):
         """
         # 获取at
         raw_xml = msg.extrainfo
-        xml_obj = ET.fromstring(raw_xml)
+        xml_obj = _parse_xml(raw_xml)
         at_xml = xml_obj.find("./atuserlist")
-        event_id = str(uuid4())
         if at_xml is None:
             # 没有at
             # 获取message
             message = Message(MessageSegment.text(msg.message))
-            # 判断群聊还是私聊
-            if "@chatroom" in msg.sender:
-                return GroupMessageEvent(
-                    id=event_id,
-                    time=msg.timestamp,
-                    self=BotSelf(user_id=msg.self),
-                    message_id=str(msg.msgid),
-                    message=message,
-                    alt_message=str(message),
-                    user_id=msg.wxid,
-                    group_id=msg.sender,
-                )
-            return PrivateMessageEvent(
-                id=event_id,
-                time=msg.timestamp,
-                self=BotSelf(user_id=msg.self),
-                message_id=str(msg.msgid),
-                message=message,
-                alt_message=str(message),
-                user_id=msg.wxid,
-            )
+            # 纯文本的替代表示即原文
+            return _build_msg_event(msg, message, alt_message=msg.message)
 
         # 获取at
         at_list = at_xml.text.split(",")
-        if at_list[0] == "":
-            # pc微信发消息at时，会多一个','
-            at_list.pop(0)
+        # pc微信发消息at时，会多一个','，跳过它
+        at_index = 1 if at_list[0] == "" else 0
+        at_count = len(at_list)
 
         # 这里用正则分割文本，来制造消息段，可能会有bug
-        regex = r"(@[^@\s]+\s)"
-        msg_list = re.split(regex, msg.message)
+        # 分割结果中奇数位为匹配到的at
+        msg_list = _AT_RE.split(msg.message)
         new_msg = Message()
+        # 分割结果拼接后即为原文，cursor为当前分段在原文中的位置
+        cursor = 0
         for index, one_msg in enumerate(msg_list):
-            if re.search(regex, one_msg) is None:
-                if one_msg == "":
-                    continue
-                new_msg.append(MessageSegment.text(one_msg))
+            if index % 2 == 0:
+                if one_msg != "":
+                    new_msg.append(MessageSegment.text(one_msg))
             else:
-                try:
-                    at_one = at_list.pop(0)
-                except IndexError:
-                    # 这里已经没有at目标了
-                    text = "".join(msg_list[index:])
-                    new_msg.append(MessageSegment.text(text))
+                if at_index >= at_count:
+                    # 这里已经没有at目标了，剩下的原文作为文本
+                    new_msg.append(MessageSegment.text(msg.message[cursor:]))
                     break
+                at_one = at_list[at_index]
+                at_index += 1
                 if at_one == "notify@all":
-                    new_msg.append(MessageSegment.mention_all())
+                    new_msg.append(_MENTION_ALL)
                 else:
                     new_msg.append(MessageSegment.mention(at_one))
-        return GroupMessageEvent(
-            id=event_id,
-            time=msg.timestamp,
-            self=BotSelf(user_id=msg.self),
-            message_id=str(msg.msgid),
-            message=new_msg,
-            alt_message=str(new_msg),
-            user_id=msg.wxid,
-            group_id=msg.sender,
-        )
+            cursor += len(one_msg)
+        return _build_msg_event(msg, new_msg)
 
     @add_handler(WxType.IMAGE_MSG)
     async def handle_image(self, msg: WechatMessage) -> E:
         """
         处理图片
         """
-        file_name = Path(msg.filepath).stem
+        # 微信返回的是windows路径
+        file_name = ntpath.splitext(ntpath.basename(msg.filepath))[0]
         # 找图片
-        file_path = f"{self.image_path.absolute()}/{file_name}"
+        file_path = f"{self._image_dir}/{file_name}"
         file = await self.file_manager.wait_for_image(file_path)
         if file is None:
             return None
 
-        event_id = str(uuid4())
         file_id = await self.file_manager.cache_file_id_from_path(
             file, file.name, copy=False
         )
         message = Message(MessageSegment.image(file_id=file_id))
-        # 检测是否为群聊
-        if "@chatroom" in msg.sender:
-            return GroupMessageEvent(
-                id=event_id,
-                time=msg.timestamp,
-                self=BotSelf(user_id=msg.self),
-                message_id=str(msg.msgid),
-                message=message,
-                alt_message=str(message),
-                user_id=msg.wxid,
-                group_id=msg.sender,
-            )
-        return PrivateMessageEvent(
-            id=event_id,
-            time=msg.timestamp,
-            self=BotSelf(user_id=msg.self),
-            message_id=str(msg.msgid),
-            message=message,
-            alt_message=str(message),
-            user_id=msg.wxid,
-        )
+        return _build_msg_event(msg, message)
 
     @add_handler(WxType.VOICE_MSG)
     async def handle_voice(self, msg: WechatMessage) -> E:
@@ -251,47 +373,24 @@ class MessageHandler(Generic[E]):
         处理语音
         """
         file_name = msg.sign
-        file = self.voice_path / f"{file_name}.amr"
+        file = Path(f"{self._voice_dir}/{file_name}.amr")
         file = await self.file_manager.wait_for_file(file)
         if file is None:
             return None
 
-        event_id = str(uuid4())
         file_id = await self.file_manager.cache_file_id_from_path(
             file, file.name, copy=False
         )
         message = Message(MessageSegment.image(file_id=file_id))
-        # 检测是否为群聊
-        if "@chatroom" in msg.sender:
-            return GroupMessageEvent(
-                id=event_id,
-                time=msg.timestamp,
-                self=BotSelf(user_id=msg.self),
-                message_id=str(msg.msgid),
-                message=message,
-                alt_message=str(message),
-                user_id=msg.wxid,
-                group_id=msg.sender,
-            )
-        return PrivateMessageEvent(
-            id=event_id,
-            time=msg.timestamp,
-            self=BotSelf(user_id=msg.self),
-            message_id=str(msg.msgid),
-            message=message,
-            alt_message=str(message),
-            user_id=msg.wxid,
-        )
+        return _build_msg_event(msg, message)
 
     @add_handler(WxType.FRIEND_REQUEST)
     def handle_friend_request(self, msg: WechatMessage) -> E:
         """
         处理好友请求
         """
-        event_id = str(uuid4())
-        raw_xml = msg.message
-        xml_obj = ET.fromstring(raw_xml)
-        attrib = xml_obj.attrib
+        event_id = _event_id()
+        attrib = _root_attrib(msg.message)
         return FriendRequestEvent(
             id=event_id,
             time=msg.timestamp,
@@ -311,12 +410,10 @@ class MessageHandler(Generic[E]):
         """
         处理名片消息
         """
-        event_id = str(uuid4())
-        raw_xml = msg.message
-        xml_obj = ET.fromstring(raw_xml)
-        attrib = xml_obj.attrib
+        event_id = _event_id()
+        attrib = _root_attrib(msg.message)
         # 检测是否为群聊
-        if "@chatroom" in msg.sender:
+        if msg.is_group:
             return GetGroupCardNotice(
                 id=event_id,
                 time=msg.timestamp,
@@ -348,87 +445,41 @@ class MessageHandler(Generic[E]):
         """
         处理视频
         """
-        video_img = self.wechat_path / msg.thumb_path
-        video_path = video_img.parent
-        video_name = f"{video_img.stem}.mp4"
-        video = video_path / video_name
+        thumb_dir, thumb_name = ntpath.split(msg.thumb_path)
+        video_name = f"{ntpath.splitext(thumb_name)[0]}.mp4"
+        video = Path(ntpath.join(self._wechat_dir, thumb_dir, video_name))
         file = await self.file_manager.wait_for_file(video)
         if file is None:
             return None
 
-        event_id = str(uuid4())
         file_id = await self.file_manager.cache_file_id_from_path(
             file, video_name, copy=False
         )
         message = Message(MessageSegment.video(file_id=file_id))
-        # 检测是否为群聊
-        if "@chatroom" in msg.sender:
-            return GroupMessageEvent(
-                id=event_id,
-                time=msg.timestamp,
-                self=BotSelf(user_id=msg.self),
-                message_id=str(msg.msgid),
-                message=message,
-                alt_message=str(message),
-                user_id=msg.wxid,
-                group_id=msg.sender,
-            )
-        return PrivateMessageEvent(
-            id=event_id,
-            time=msg.timestamp,
-            self=BotSelf(user_id=msg.self),
-            message_id=str(msg.msgid),
-            message=message,
-            alt_message=str(message),
-            user_id=msg.wxid,
-        )
+        return _build_msg_event(msg, message)
 
     @add_handler(WxType.EMOJI_MSG)
     async def handle_emoji(self, msg: WechatMessage) -> E:
         """
         处理gif表情
         """
-        event_id = str(uuid4())
         # 获取文件名
         raw_xml = msg.message
-        xml_obj = ET.fromstring(raw_xml)
+        xml_obj = _parse_xml(raw_xml)
         emoji_url = xml_obj.find("./emoji").attrib.get("cdnurl")
         emoji = unquote(emoji_url)
         file_id = await self.file_manager.cache_file_id_from_url(
             emoji, f"{msg.msgid}.gif"
         )
         message = Message(MessageSegment.emoji(file_id=file_id))
-        # 检测是否为群聊
-        if "@chatroom" in msg.sender:
-            return GroupMessageEvent(
-                id=event_id,
-                time=msg.timestamp,
-                self=BotSelf(user_id=msg.self),
-                message_id=str(msg.msgid),
-                message=message,
-                alt_message=str(message),
-                user_id=msg.wxid,
-                group_id=msg.sender,
-            )
-        return PrivateMessageEvent(
-            id=event_id,
-            time=msg.timestamp,
-            self=BotSelf(user_id=msg.self),
-            message_id=str(msg.msgid),
-            message=message,
-            alt_message=str(message),
-            user_id=msg.wxid,
-        )
+        return _build_msg_event(msg, message)
 
     @add_handler(WxType.LOCATION_MSG)
     def handle_location(self, msg: WechatMessage) -> E:
         """
         处理位置信息
         """
-        event_id = str(uuid4())
-        raw_xml = msg.message
-        xml_obj = ET.fromstring(raw_xml)
-        attrib = xml_obj.attrib
+        attrib = _root_attrib(msg.message)
         message = Message(
             MessageSegment.location(
                 latitude=attrib["x"],
@@ -437,27 +488,7 @@ class MessageHandler(Generic[E]):
                 content=attrib["poiname"],
             )
         )
-        # 检测是否为群聊
-        if "@chatroom" in msg.sender:
-            return GroupMessageEvent(
-                id=event_id,
-                time=msg.timestamp,
-                self=BotSelf(user_id=msg.self),
-                message_id=str(msg.msgid),
-                message=message,
-                alt_message=str(message),
-                user_id=msg.wxid,
-                group_id=msg.sender,
-            )
-        return PrivateMessageEvent(
-            id=event_id,
-            time=msg.timestamp,
-            self=BotSelf(user_id=msg.self),
-            message_id=str(msg.msgid),
-            message=message,
-            alt_message=str(message),
-            user_id=msg.wxid,
-        )
+        return _build_msg_event(msg, message)
 
     @add_handler(WxType.APP_MSG)
     async def handle_app(self, msg: WechatMessage) -> Optional[E]:
@@ -465,14 +496,21 @@ class MessageHandler(Generic[E]):
         处理app消息
         """
         raw_xml = msg.message
-        xml_obj = ET.fromstring(raw_xml)
+        # 先扫描type，没有处理函数时不必解析整个xml
+        _type = _scan_app_type(raw_xml)
+        if _type is not None and (
+            _type == AppType.TRANSFER or _get_app_entry(_type) is None
+        ):
+            return None
+        xml_obj = _parse_xml(raw_xml)
         app = xml_obj.find("./appmsg")
         _type = int(app.find("./type").text)
         result = None
-        handler = APP_HANDLERS.get(_type)
-        if handler is None:
+        entry = _get_app_entry(_type)
+        if entry is None:
             return None
-        if iscoroutinefunction(handler):
+        is_coroutine, handler = entry
+        if is_coroutine:
             result = await handler(AppMessageHandler, self, msg, app)
         else:
             result = handler(AppMessageHandler, self, msg, app)
@@ -483,27 +521,26 @@ class MessageHandler(Generic[E]):
         """
         处理系统提示
         """
-        result = None
-        for handler in SYS_NOTICE_HANDLERS:
-            result = handler(SysNoticeHandler, msg)
-            if result is not None:
-                break
-        return result
+        handler = SYS_NOTICE_HANDLERS.get(msg.message)
+        if handler is not None:
+            return handler(SysNoticeHandler, msg)
+        for match, handler in SYS_NOTICE_MATCHERS:
+            if match(msg.message):
+                result = handler(SysNoticeHandler, msg)
+                if result is not None:
+                    return result
+        return None
 
     @add_handler(WxType.SYSTEM_MSG)
     def handle_group_sys(self, msg: WechatMessage) -> Optional[E]:
         """
         处理系统消息
         """
-        result = None
-        raw_xml = msg.message
-        xml_obj = ET.fromstring(raw_xml)
-        notice_type = xml_obj.attrib["type"]
-        handler = SYS_MSG_HANDLERS.get(notice_type)
+        xml_obj = _parse_xml(msg.message)
+        handler = SYS_MSG_HANDLERS.get(xml_obj.attrib["type"])
         if handler is None:
             return None
-        result = handler(SysMsgHandler, msg, xml_obj)
-        return result
+        return handler(SysMsgHandler, msg, xml_obj)
 
 
 class AppMessageHandler(Generic[E]):
@@ -519,14 +556,14 @@ class AppMessageHandler(Generic[E]):
         """
         处理其他应用分享的链接
         """
-        event_id = str(uuid4())
-        title = app.find("./title").text
-        des = app.find("./des").text
-        url = app.find("./url").text.replace(" ", "")
+        children = _children(app)
+        title = children["title"].text
+        des = children["des"].text
+        url = children["url"].text.replace(" ", "")
         image_path = msg.thumb_path
         file_id = None
         if image_path != "":
-            image_path = f"{msg_handler.wechat_path}/{image_path}"
+            image_path = f"{msg_handler._wechat_dir}/{image_path}"
             image_path = Path(image_path)
             file_id = await msg_handler.file_manager.cache_file_id_from_path(
                 image_path, name=image_path.stem, copy=False
@@ -536,27 +573,7 @@ class AppMessageHandler(Generic[E]):
         message = Message(
             MessageSegment.link(title=title, des=des, url=url, file_id=file_id)
         )
-        # 检测是否为群聊
-        if "@chatroom" in msg.sender:
-            return GroupMessageEvent(
-                id=event_id,
-                time=msg.timestamp,
-                self=BotSelf(user_id=msg.self),
-                message_id=str(msg.msgid),
-                message=message,
-                alt_message=str(message),
-                user_id=msg.wxid,
-                group_id=msg.sender,
-            )
-        return PrivateMessageEvent(
-            id=event_id,
-            time=msg.timestamp,
-            self=BotSelf(user_id=msg.self),
-            message_id=str(msg.msgid),
-            message=message,
-            alt_message=str(message),
-            user_id=msg.wxid,
-        )
+        return _build_msg_event(msg, message)
 
     @classmethod
     @add_app_handler(AppType.LINK_MSG)
@@ -566,14 +583,14 @@ class AppMessageHandler(Generic[E]):
         """
         处理链接
         """
-        event_id = str(uuid4())
-        title = app.find("./title").text
-        des = app.find("./des").text
-        url = app.find("./url").text.replace(" ", "")
+        children = _children(app)
+        title = children["title"].text
+        des = children["des"].text
+        url = children["url"].text.replace(" ", "")
         image_path = msg.filepath
         file_id = None
         if image_path != "":
-            image_path = f"{msg_handler.wechat_path}/{image_path}"
+            image_path = f"{msg_handler._wechat_dir}/{image_path}"
             image_path = Path(image_path)
             file_id = await msg_handler.file_manager.cache_file_id_from_path(
                 image_path, name=image_path.stem, copy=False
@@ -583,27 +600,7 @@ class AppMessageHandler(Generic[E]):
         message = Message(
             MessageSegment.link(title=title, des=des, url=url, file_id=file_id)
         )
-        # 检测是否为群聊
-        if "@chatroom" in msg.sender:
-            return GroupMessageEvent(
-                id=event_id,
-                time=msg.timestamp,
-                self=BotSelf(user_id=msg.self),
-                message_id=str(msg.msgid),
-                message=message,
-                alt_message=str(message),
-                user_id=msg.wxid,
-                group_id=msg.sender,
-            )
-        return PrivateMessageEvent(
-            id=event_id,
-            time=msg.timestamp,
-            self=BotSelf(user_id=msg.self),
-            message_id=str(msg.msgid),
-            message=message,
-            alt_message=str(message),
-            user_id=msg.wxid,
-        )
+        return _build_msg_event(msg, message)
 
     @classmethod
     @add_app_handler(AppType.FILE_NOTICE)
@@ -613,17 +610,18 @@ class AppMessageHandler(Generic[E]):
         """
         处理文件消息
         """
-        event_id = str(uuid4())
-        file_name = app.find("./title").text
-        md5 = app.find("./md5").text
-        appattach = app.find("./appattach")
-        file_length = int(appattach.find("./totallen").text)
+        event_id = _event_id()
+        children = _children(app)
+        file_name = children["title"].text
+        md5 = children["md5"].text
+        appattach = _children(children["appattach"])
+        file_length = int(appattach["totallen"].text)
         # 判断是否为通知还是下载完成
-        overwrite_newmsgid = appattach.find("./overwrite_newmsgid")
+        overwrite_newmsgid = appattach.get("overwrite_newmsgid")
         if overwrite_newmsgid is None:
             # 通知事件
             # 检测是否为群聊
-            if "@chatroom" in msg.sender:
+            if msg.is_group:
                 return GetGroupFileNotice(
                     id=event_id,
                     time=msg.timestamp,
@@ -646,7 +644,7 @@ class AppMessageHandler(Generic[E]):
                 )
 
         # 文件消息
-        file = msg_handler.wechat_path / msg.filepath
+        file = Path(ntpath.join(msg_handler._wechat_dir, msg.filepath))
         file = await msg_handler.file_manager.wait_for_file(file)
         if file is None:
             return None
@@ -655,27 +653,7 @@ class AppMessageHandler(Generic[E]):
             file, file_name, copy=False
         )
         message = Message(MessageSegment.file(file_id=file_id))
-        # 检测是否为群聊
-        if "@chatroom" in msg.sender:
-            return GroupMessageEvent(
-                id=event_id,
-                time=msg.timestamp,
-                self=BotSelf(user_id=msg.self),
-                message_id=str(msg.msgid),
-                message=message,
-                alt_message=str(message),
-                user_id=msg.wxid,
-                group_id=msg.sender,
-            )
-        return PrivateMessageEvent(
-            id=event_id,
-            time=msg.timestamp,
-            self=BotSelf(user_id=msg.self),
-            message_id=str(msg.msgid),
-            message=message,
-            alt_message=str(message),
-            user_id=msg.wxid,
-        )
+        return _build_msg_event(msg, message, event_id)
 
     @classmethod
     @add_app_handler(AppType.QUOTE)
@@ -685,34 +663,15 @@ class AppMessageHandler(Generic[E]):
         """
         处理引用
         """
-        event_id = str(uuid4())
-        text = app.find("./title").text
-        from_msgid = app.find("./refermsg/svrid").text
-        from_user = app.find("./refermsg/fromusr").text
+        children = _children(app)
+        text = children["title"].text
+        refermsg = _children(children["refermsg"])
+        from_msgid = refermsg["svrid"].text
+        from_user = refermsg["fromusr"].text
         message = MessageSegment.reply(
             message_id=from_msgid, user_id=from_user
         ) + MessageSegment.text(text)
-        # 检测是否为群聊
-        if "@chatroom" in msg.sender:
-            return GroupMessageEvent(
-                id=event_id,
-                time=msg.timestamp,
-                self=BotSelf(user_id=msg.self),
-                message_id=str(msg.msgid),
-                message=message,
-                alt_message=str(message),
-                user_id=msg.wxid,
-                group_id=msg.sender,
-            )
-        return PrivateMessageEvent(
-            id=event_id,
-            time=msg.timestamp,
-            self=BotSelf(user_id=msg.self),
-            message_id=str(msg.msgid),
-            message=message,
-            alt_message=str(message),
-            user_id=msg.wxid,
-        )
+        return _build_msg_event(msg, message)
 
     @classmethod
     @add_app_handler(AppType.APP)
@@ -722,32 +681,12 @@ class AppMessageHandler(Generic[E]):
         """
         处理app消息
         """
-        event_id = str(uuid4())
-        title = app.find("./title").text
-        url = app.find("./url").text
-        app_id = app.find("./weappinfo/username").text
+        children = _children(app)
+        title = children["title"].text
+        url = children["url"].text
+        app_id = children["weappinfo"].find("./username").text
         message = Message(MessageSegment.app(app_id, title, url))
-        # 检测是否为群聊
-        if "@chatroom" in msg.sender:
-            return GroupMessageEvent(
-                id=event_id,
-                time=msg.timestamp,
-                self=BotSelf(user_id=msg.self),
-                message_id=str(msg.msgid),
-                message=message,
-                alt_message=str(message),
-                user_id=msg.wxid,
-                group_id=msg.sender,
-            )
-        return PrivateMessageEvent(
-            id=event_id,
-            time=msg.timestamp,
-            self=BotSelf(user_id=msg.self),
-            message_id=str(msg.msgid),
-            message=message,
-            alt_message=str(message),
-            user_id=msg.wxid,
-        )
+        return _build_msg_event(msg, message)
 
     @classmethod
     @add_app_handler(AppType.GROUP_ANNOUNCEMENT)
@@ -755,7 +694,7 @@ class AppMessageHandler(Generic[E]):
         cls, msg_handler: MessageHandler, msg: WechatMessage, app: Element
     ) -> E:
         """处理群公告"""
-        event_id = str(uuid4())
+        event_id = _event_id()
         text = app.find("textannouncement").text
         return GetGroupAnnouncementNotice(
             id=event_id,
@@ -788,10 +727,10 @@ class SysMsgHandler(Generic[E]):
     def revoke(cls, msg: WechatMessage, xml_obj: Element) -> Optional[E]:
         """撤回消息事件"""
         msg_obj = xml_obj.find("./revokemsg/newmsgid")
-        event_id = str(uuid4())
+        event_id = _event_id()
         message_id = msg_obj.text
         # 检测是否为群聊
-        if "@chatroom" in msg.sender:
+        if msg.is_group:
             return GroupMessageDeleteEvent(
                 id=event_id,
                 time=msg.timestamp,
@@ -837,13 +776,13 @@ class SysMsgHandler(Generic[E]):
         """
         拍一拍
         """
-        pat = xml_obj.find("./pat")
-        from_user = pat.find("./fromusername").text
-        to_user = pat.find("./pattedusername").text
-        chatroom = pat.find("./chatusername").text
-        event_id = str(uuid4())
+        pat = _children(xml_obj.find("./pat"))
+        from_user = pat["fromusername"].text
+        to_user = pat["pattedusername"].text
+        chatroom = pat["chatusername"].text
+        event_id = _event_id()
         # 检测是否为群聊
-        if "@chatroom" in msg.sender:
+        if msg.is_group:
             return GetGroupPokeNotice(
                 id=event_id,
                 time=msg.timestamp,
@@ -867,14 +806,12 @@ class SysNoticeHandler(Generic[E]):
     """
 
     @classmethod
-    @add_sys_notice_handler
+    @add_sys_notice_handler("收到红包，请在手机上查看")
     def read_bag(cls, msg: WechatMessage) -> Optional[E]:
-        """"""
-        if msg.message != "收到红包，请在手机上查看":
-            return None
-        event_id = str(uuid4())
+        """收到红包"""
+        event_id = _event_id()
         # 检测是否为群聊
-        if "@chatroom" in msg.sender:
+        if msg.is_group:
             return GetGroupRedBagNotice(
                 id=event_id,
                 time=msg.timestamp,
@@ -888,3 +825,18 @@ class SysNoticeHandler(Generic[E]):
             self=BotSelf(user_id=msg.self),
             user_id=msg.wxid,
         )
+
+
+_HANDLE_TABLE = _build_table(HANDLE_DICT)
+"""消息处理器列表，按type下标查找"""
+_APP_TABLE = _build_table(APP_HANDLERS)
+"""app消息处理函数列表，按type下标查找"""
+
+
+def _get_app_entry(_type: int) -> Optional[tuple[bool, Callable[P, Optional[E]]]]:
+    """
+    获取app消息处理函数
+    """
+    if 0 <= _type < len(_APP_TABLE):
+        return _APP_TABLE[_type]
+    return APP_HANDLERS.get(_type)
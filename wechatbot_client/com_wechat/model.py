@@ -39,3 +39,8 @@ class Message(BaseModel):
     """消息类型"""
     wxid: str
     """wxid"""
+
+    @property
+    def is_group(self) -> bool:
+        """是否为群聊消息"""
+        return self.sender.endswith("@chatroom")
@@ -194,6 +194,8 @@ class Config(BaseConfig):
     """反向 WebSocket 连接地址"""
     websocket_buffer_size: int = 4
     """反向 WebSocket 的缓冲区大小，单位(Mb)"""
+    websocket_compression: bool = False
+    """WebSocket 是否启用 permessage-deflate 压缩"""
     reconnect_interval: int = 5000
     """反向 WebSocket 重连间隔"""
     log_level: Union[int, str] = "INFO"
@@ -202,6 +204,8 @@ class Config(BaseConfig):
     """日志保存天数"""
     cache_days: int = 3
     """文件缓存天数"""
+    com_thread_num: int = Field(default=1, ge=1)
+    """com调用线程数"""
 
     class Config:
         extra = "allow"
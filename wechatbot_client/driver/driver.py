@@ -165,6 +165,7 @@ class Driver:
             reload_delay=self.fastapi_config.fastapi_reload_delay,
             reload_includes=self.fastapi_config.fastapi_reload_includes,
             reload_excludes=self.fastapi_config.fastapi_reload_excludes,
+            ws_per_message_deflate=self.config.websocket_compression,
             log_config=LOGGING_CONFIG,
             **kwargs,
         )
@@ -264,6 +265,7 @@ class Driver:
             extra_headers={**setup.headers, **setup.cookies.as_header(setup)},
             open_timeout=setup.timeout,
             max_size=(2**20) * self.config.websocket_buffer_size,
+            compression="deflate" if self.config.websocket_compression else None,
         )
         async with connection as ws:
             yield BackwardWebSocket(request=setup, websocket=ws)
@@ -45,6 +45,18 @@ class FileNotFound(MessageException):
         return f"未找到文件:{self.file_id}"
 
 
+class WeChatInitError(BaseException):
+    """微信初始化失败"""
+
+    reason: str
+
+    def __init__(self, reason: str) -> None:
+        self.reason = reason
+
+    def __repr__(self) -> str:
+        return f"微信初始化失败:{self.reason}"
+
+
 class WebSocketClosed(BaseException):
     """WebSocket 连接已关闭"""
 
@@ -1,4 +1,5 @@
 import asyncio
+import os
 from pathlib import Path
 from shutil import copyfile
 from typing import Optional, Tuple
@@ -13,6 +14,9 @@ from .model import FileCache
 
 log = logger_wrapper("File Manager")
 
+IMAGE_SUFFIXES = (".jpg", ".png", ".gif")
+"""微信图片可能的后缀，按顺序查找"""
+
 
 class FileManager:
     """
@@ -184,23 +188,33 @@ class FileManager:
         """
         等待图片任务
         """
-        jpg = Path(f"{image_path}.jpg")
-        png = Path(f"{image_path}.png")
-        gif = Path(f"{image_path}.gif")
+        files = [f"{image_path}{suffix}" for suffix in IMAGE_SUFFIXES]
         while True:
             if future.cancelled():
                 return
-            if jpg.exists():
-                future.set_result(jpg)
-                return
-            if png.exists():
-                future.set_result(png)
-                return
-            if gif.exists():
-                future.set_result(gif)
+            file = self._find_file(files)
+            if file is not None:
+                future.set_result(Path(file))
                 return
             await asyncio.sleep(0.5)
 
+    @staticmethod
+    def _find_file(files: list[str]) -> Optional[str]:
+        """
+        说明:
+            按顺序查找第一个存在的文件，直接使用`os.stat`，不创建`Path`对象
+
+        返回:
+            * `str | None`: 文件路径，都不存在为None
+        """
+        for file in files:
+            try:
+                os.stat(file)
+            except OSError:
+                continue
+            return file
+        return None
+
     async def wait_for_image(self, image_path: str) -> Optional[Path]:
         """
         说明:
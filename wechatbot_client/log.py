@@ -31,13 +31,17 @@ class Filter:
     def __init__(self) -> None:
         self.level: Union[int, str] = "INFO"
 
+    @property
+    def levelno(self) -> int:
+        """当前过滤等级的数值"""
+        return (
+            logger.level(self.level).no if isinstance(self.level, str) else self.level
+        )
+
     def __call__(self, record):
         module_name: str = record["name"]
         record["name"] = module_name.split(".")[0]
-        levelno = (
-            logger.level(self.level).no if isinstance(self.level, str) else self.level
-        )
-        return record["level"].no >= levelno
+        return record["level"].no >= self.levelno
 
 
 default_format: str = (
@@ -77,6 +81,11 @@ logger_id = logger.add(
 )
 
 
+def is_log_enabled(level: str) -> bool:
+    """判断该等级的日志是否会输出，用来跳过开销较大的日志格式化"""
+    return logger.level(level).no >= default_filter.levelno
+
+
 def log_init(log_days: int) -> None:
     """日志初始化"""
     cwd = Path(".") / LOG_PATH
@@ -55,6 +55,8 @@ async def start_up() -> None:
     await database_init()
     # 注册消息事件
     wechat.open_recv_msg(f"./{FILE_CACHE}")
+    # 开启事件发送
+    wechat.start_event_workers()
     # 开始监听event
     pump_event_task = asyncio.create_task(pump_event())
     # 开启http路由
@@ -88,6 +90,7 @@ async def shutdown() -> None:
         if not pump_event_task.done():
             pump_event_task.cancel()
     await wechat.stop_backward()
+    await wechat.stop_event_workers()
     wechat.close()
 
 
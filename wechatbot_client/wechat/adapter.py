@@ -3,10 +3,9 @@ adapter,用来管理driver和websocket
 """
 import asyncio
 import contextlib
-import json
 import time
 from abc import abstractmethod
-from typing import Any, AsyncGenerator, Optional, Union, cast
+from typing import Any, AsyncGenerator, Iterable, Optional, TypeVar, Union, cast
 from uuid import uuid4
 
 import msgpack
@@ -24,7 +23,6 @@ from wechatbot_client.driver import (
     URL,
     BackwardWebSocket,
     Driver,
-    FastAPIWebSocket,
     HTTPServerSetup,
     Request,
     Response,
@@ -32,15 +30,38 @@ from wechatbot_client.driver import (
     WebSocketServerSetup,
 )
 from wechatbot_client.exception import WebSocketClosed
+from wechatbot_client.log import is_log_enabled
 from wechatbot_client.onebot12 import ConnectEvent, Event, StatusUpdateEvent
 from wechatbot_client.utils import DataclassEncoder, escape_tag, logger_wrapper
 
 from .utils import get_auth_bearer
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 log = logger_wrapper("OneBot V12")
 
+A = TypeVar("A", bound=ActionRequest)
+
 HTTP_EVENT_LIST: list[Event] = []
 """get_latest_events的event储存"""
+EVENT_QUEUE_SIZE = 10000
+"""待发送事件队列的最大长度"""
+EVENT_WORKER_NUM = 4
+"""发送事件的worker数量"""
+WEBHOOK_WORKER_NUM = 4
+"""发送webhook的worker数量"""
+
+
+def decode_ws_data(data: Union[str, bytes]) -> Any:
+    """
+    解析ws收到的数据，文本帧为json，二进制帧为msgpack
+    """
+    if type(data) is str:
+        return json_loads(data)
+    return msgpack.unpackb(data, raw=False)
 
 
 def get_connet_event() -> ConnectEvent:
@@ -65,15 +86,68 @@ class Adapter:
     """应用设置"""
     event_models: dict
     """事件模型映射"""
-    tasks: list[asyncio.Task]
-    """反向连接ws任务列表"""
+    tasks: set[asyncio.Task]
+    """反向连接ws任务集合"""
     driver: Driver
     """后端驱动"""
+    _auth_header: Optional[str]
+    """Authorization头，未设置access_token时为None"""
+    _event_queue: asyncio.Queue
+    """待发送事件队列"""
+    _webhook_queue: asyncio.Queue
+    """待发送webhook队列，与事件队列分开，避免webhook阻塞ws发送"""
+    _event_workers: list[asyncio.Task]
+    """发送事件和webhook的worker任务"""
+    _backward_urls: list[URL]
+    """反向ws连接地址"""
+    _webhook_urls: list[URL]
+    """webhook上报地址"""
+    _webhook_headers: dict[str, str]
+    """webhook请求头"""
 
     def __init__(self, config: Config) -> None:
         self.config = config
         self.driver = Driver(config)
-        self.tasks = []
+        self.tasks = set()
+        self._auth_header = (
+            f"Bearer {config.access_token}" if config.access_token != "" else None
+        )
+        self._event_queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self._webhook_queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self._event_workers = []
+        self._backward_urls = self._parse_urls(config.websocket_url, "websocket_url")
+        self._webhook_urls = self._parse_urls(config.webhook_url, "webhook_url")
+        self._webhook_headers = {
+            "User-Agent": USER_AGENT,
+            "Content-Type": "application/json",
+            "X-OneBot-Version": ONEBOT_VERSION,
+            "X-Impl": IMPL,
+        }
+        if self._auth_header is not None:
+            self._webhook_headers["Authorization"] = self._auth_header
+
+    @staticmethod
+    def _parse_urls(urls: Iterable[str], name: str) -> list[URL]:
+        """
+        说明:
+            解析配置中的地址，错误的地址只在这里记录一次
+
+        参数:
+            * `urls`: 地址列表
+            * `name`: 配置项名称
+        """
+        result = []
+        for url in urls:
+            try:
+                result.append(URL(url))
+            except Exception as e:
+                log(
+                    "ERROR",
+                    f"<r><bg #f8bbd0>Bad url {escape_tag(url)} "
+                    f"in {name} config</bg #f8bbd0></r>",
+                    e,
+                )
+        return result
 
     def setup_http_server(self, setup: HTTPServerSetup) -> None:
         """设置一个 HTTP 服务器路由配置"""
@@ -99,10 +173,14 @@ class Adapter:
         """
         检测access_token
         """
-        token = get_auth_bearer(request.headers.get("Authorization"))
-
-        access_token = self.config.access_token
-        if access_token != "" and access_token != token:
+        if self._auth_header is None:
+            return None
+        authorization = request.headers.get("Authorization")
+        # 大多数请求与预先生成的头完全一致
+        if authorization == self._auth_header:
+            return None
+        token = get_auth_bearer(authorization)
+        if self.config.access_token != token:
             msg = (
                 "Authorization Header is invalid"
                 if token
@@ -140,16 +218,7 @@ class Adapter:
         except Exception as e:
             log("ERROR", f"发送status_update事件失败:{e}")
         try:
-            while True:
-                data = await websocket.receive()
-                raw_data = (
-                    json.loads(data) if isinstance(data, str) else msgpack.unpackb(data)
-                )
-                if action := self.json_to_ws_action(raw_data):
-                    response = await self.action_ws_request(action)
-                    await websocket.send(
-                        response.json(ensure_ascii=False, cls=DataclassEncoder)
-                    )
+            await self._receive_ws_actions(websocket)
         except WebSocketClosed:
             log(
                 "WARNING",
@@ -167,6 +236,23 @@ class Adapter:
                 await websocket.close()
             self.driver.ws_disconnect(seq)
 
+    async def _receive_ws_actions(self, websocket: WebSocket) -> None:
+        """
+        循环接收ws上的action请求并回复，直到连接关闭
+        """
+        while True:
+            data = await websocket.receive()
+            try:
+                json_data = decode_ws_data(data)
+            except Exception as e:
+                log("ERROR", f"<r>ws数据解析错误: </r>{e}")
+                continue
+            if action := self.json_to_ws_action(json_data):
+                response = await self.action_ws_request(action)
+                await websocket.send(
+                    response.json(ensure_ascii=False, cls=DataclassEncoder)
+                )
+
     async def handle_http(self, request: Request) -> Response:
         """处理http任务"""
 
@@ -177,7 +263,7 @@ class Adapter:
 
         data = request.content
         if data is not None:
-            json_data = json.loads(data)
+            json_data = json_loads(data)
             if action := self.json_to_action(json_data):
                 # get_latest_events处理
                 if action.action == "get_latest_events":
@@ -200,8 +286,8 @@ class Adapter:
                     "X-Impl": IMPL,
                     "X-OneBot-Version": f"{ONEBOT_VERSION}",
                 }
-                if self.config.access_token != "":
-                    headers["Authorization"] = f"Bearer {self.config.access_token}"
+                if self._auth_header is not None:
+                    headers["Authorization"] = self._auth_header
                 return Response(
                     200,
                     headers=headers,
@@ -215,17 +301,11 @@ class Adapter:
         """
         开启反向ws连接应用端
         """
-        for url in self.config.websocket_url:
-            try:
-                ws_url = URL(url)
-                self.tasks.append(asyncio.create_task(self._backward_ws(ws_url)))
-            except Exception as e:
-                log(
-                    "ERROR",
-                    f"<r><bg #f8bbd0>Bad url {escape_tag(url)} "
-                    "in websocket_url config</bg #f8bbd0></r>",
-                    e,
-                )
+        for url in self._backward_urls:
+            task = asyncio.create_task(self._backward_ws(url))
+            self.tasks.add(task)
+            # 任务结束后自行移除
+            task.add_done_callback(self.tasks.discard)
 
     async def _backward_ws(self, url: URL) -> None:
         """
@@ -234,16 +314,17 @@ class Adapter:
         headers = {
             "User-Agent": USER_AGENT,
         }
-        if self.config.access_token != "":
-            headers["Authorization"] = f"Bearer {self.config.access_token}"
+        if self._auth_header is not None:
+            headers["Authorization"] = self._auth_header
         setup = Request("GET", url, headers=headers, timeout=5.0)
+        url_tag = escape_tag(str(url))
         log("DEBUG", f"<y>正在连接到url: {url}</y>")
         while True:
             try:
                 async with self.start_websocket(setup) as websocket:
                     log(
                         "SUCCESS",
-                        f"WebSocket Connection to {escape_tag(str(url))} established",
+                        f"WebSocket Connection to {url_tag} established",
                     )
                     seq = self.driver.ws_connect(websocket)
                     log("SUCCESS", f"<y>新的websocket连接，编号为: {seq}...</y>")
@@ -264,20 +345,7 @@ class Adapter:
                     except Exception as e:
                         log("ERROR", f"发送status_update事件失败:{e}")
                     try:
-                        while True:
-                            data = await websocket.receive()
-                            raw_data = (
-                                json.loads(data)
-                                if isinstance(data, str)
-                                else msgpack.unpackb(data)
-                            )
-                            if action := self.json_to_ws_action(raw_data):
-                                response = await self.action_ws_request(action)
-                                await websocket.send(
-                                    response.json(
-                                        ensure_ascii=False, cls=DataclassEncoder
-                                    )
-                                )
+                        await self._receive_ws_actions(websocket)
                     except WebSocketClosed as e:
                         log(
                             "ERROR",
@@ -287,7 +355,7 @@ class Adapter:
                         log(
                             "ERROR",
                             f"<r><bg #f8bbd0>处理来自 websocket 的数据时出错: {e}"
-                            f"{escape_tag(str(url))} 正在尝试重连...</bg #f8bbd0></r>",
+                            f"{url_tag} 正在尝试重连...</bg #f8bbd0></r>",
                         )
                     finally:
                         self.driver.ws_disconnect(seq)
@@ -296,48 +364,57 @@ class Adapter:
                 log(
                     "ERROR",
                     "<r><bg #f8bbd0>连接到 "
-                    f"{escape_tag(str(url))} 时出错{e} 正在尝试重连...</bg #f8bbd0></r>",
+                    f"{url_tag} 时出错{e} 正在尝试重连...</bg #f8bbd0></r>",
                 )
 
             await asyncio.sleep(self.config.reconnect_interval / 1000)
 
     async def stop_backward(self) -> None:
         """关闭反向ws连接任务"""
-        for task in self.tasks:
-            if not task.done():
-                task.cancel()
+        # 已结束的任务cancel无效果，无需检查
+        tasks = list(self.tasks)
+        for task in tasks:
+            task.cancel()
+        # 等待任务退出，连接在此期间被正常关闭
+        await asyncio.gather(*tasks, return_exceptions=True)
 
     @classmethod
-    def json_to_action(cls, json_data: Any) -> Optional[ActionRequest]:
+    def json_to_action(
+        cls, json_data: Any, model: type[A] = ActionRequest
+    ) -> Optional[A]:
         """
-        json转换为action
+        说明:
+            json转换为action
+
+        参数:
+            * `json_data`: 请求数据
+            * `model`: action模型
         """
         if not isinstance(json_data, dict):
             return None
+        # 缺少action时不必进入模型校验
+        if "action" not in json_data:
+            log("ERROR", f"<r>action请求错误: </r>{json_data}")
+            return None
         try:
-            action = ActionRequest.parse_obj(json_data)
+            action = model.parse_obj(json_data)
         except ValidationError:
             log("ERROR", f"<r>action请求错误: </r>{json_data}")
             return None
-        logstring = str(action.dict())
-        if len(logstring) > 200:
-            logstring = logstring[:200] + "..."
-        log("SUCCESS", f"<y>收到action请求: </y>{logstring}")
+        if is_log_enabled("SUCCESS"):
+            logstring = str(action.dict())
+            if len(logstring) > 200:
+                logstring = logstring[:200] + "..."
+            log("SUCCESS", f"<y>收到action请求: </y>{logstring}")
         return action
 
     @classmethod
     def json_to_ws_action(cls, json_data: Any) -> Optional[WsActionRequest]:
         """json转换为wsaction"""
-        if not isinstance(json_data, dict):
-            return None
-        try:
-            echo = json_data.pop("echo")
-        except Exception:
-            return None
-        action = cls.json_to_action(json_data)
-        if action is None:
+        if not isinstance(json_data, dict) or "echo" not in json_data:
             return None
-        return WsActionRequest(echo=echo, **action.dict())
+        # echo一并校验，只解析一次模型
+        return cls.json_to_action(json_data, WsActionRequest)
 
     @abstractmethod
     def get_status_update_event(slef) -> StatusUpdateEvent:
@@ -374,63 +451,114 @@ class Adapter:
                 HTTP_EVENT_LIST.pop(0)
             HTTP_EVENT_LIST.append(event)
 
-    async def webhook_event(self, event: Event) -> None:
+    async def webhook_event(self, data: str) -> None:
         """
-        处理webhook
+        处理webhook，`data`为序列化后的事件
         """
         log("DEBUG", "发送webhook...")
 
-        headers = {
-            "User-Agent": USER_AGENT,
-            "Content-Type": "application/json",
-            "X-OneBot-Version": ONEBOT_VERSION,
-            "X-Impl": IMPL,
-        }
-        if self.config.access_token != "":
-            headers["Authorization"] = f"Bearer {self.config.access_token}"
-        for url in self.config.webhook_url:
-            try:
-                post_url = URL(url)
-                setup = Request(
+        timeout = self.config.webhook_timeout / 1000
+        task = [
+            self.driver.request(
+                Request(
                     method="POST",
-                    url=post_url,
-                    headers=headers,
-                    json=event.json(
-                        by_alias=True, ensure_ascii=False, cls=DataclassEncoder
-                    ),
-                    timeout=self.config.webhook_timeout / 1000,
+                    url=url,
+                    headers=self._webhook_headers,
+                    content=data,
+                    timeout=timeout,
                 )
-                await self.driver.request(setup)
-            except Exception as e:
-                log("ERROR", f"发送webhook出现错误:{e}")
+            )
+            for url in self._webhook_urls
+        ]
+        results = await asyncio.gather(*task, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                log("ERROR", f"发送webhook出现错误:{result}")
+
+    async def websocket_event(self, data: str) -> None:
+        """
+        处理websocket发送事件，`data`为序列化后的事件
+        """
+        task = [one.send(data) for one in self.driver.connects.values()]
+        results = await asyncio.gather(*task, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                log("ERROR", f"发送ws消息出错:{result}")
 
-    async def _send_ws(
-        self, ws: Union[FastAPIWebSocket, BackwardWebSocket], event: Event
-    ) -> None:
+    async def handle_event(self, event: Event) -> None:
         """
-        发送ws消息
+        处理event，放入队列由worker发送，队列已满时丢弃
         """
-        await ws.send(
-            event.json(by_alias=True, ensure_ascii=False, cls=DataclassEncoder)
+        # 生产者为每条消息各一个任务，等待入队并不能限制积压，队列满时直接丢弃
+        try:
+            self._event_queue.put_nowait(event)
+        except asyncio.QueueFull:
+            log("WARNING", f"事件队列已满，丢弃事件:{event.id}")
+
+    def start_event_workers(self) -> None:
+        """
+        开启发送事件的worker
+        """
+        self._event_workers = [
+            asyncio.create_task(self._event_worker()) for _ in range(EVENT_WORKER_NUM)
+        ]
+        self._event_workers.extend(
+            asyncio.create_task(self._webhook_worker())
+            for _ in range(WEBHOOK_WORKER_NUM)
         )
 
-    async def websocket_event(self, event: Event) -> None:
+    async def stop_event_workers(self) -> None:
         """
-        处理websocket发送事件
+        关闭发送事件的worker
         """
-        task = [self._send_ws(one, event) for one in self.driver.connects.values()]
-        try:
-            asyncio.gather(*task)
-        except Exception as e:
-            log("ERROR", f"发送ws消息出错:{e}")
+        for task in self._event_workers:
+            task.cancel()
+        await asyncio.gather(*self._event_workers, return_exceptions=True)
+        self._event_workers = []
 
-    async def handle_event(self, event: Event) -> None:
+    async def _event_worker(self) -> None:
         """
-        处理event
+        从队列中取出事件并发送
+        """
+        while True:
+            event = await self._event_queue.get()
+            try:
+                await self._send_event(event)
+            except Exception as e:
+                log("ERROR", f"发送事件出错:{e}")
+            finally:
+                self._event_queue.task_done()
+
+    async def _webhook_worker(self) -> None:
+        """
+        从队列中取出序列化后的事件并发送webhook
+        """
+        while True:
+            data = await self._webhook_queue.get()
+            try:
+                await self.webhook_event(data)
+            except Exception as e:
+                log("ERROR", f"发送webhook出现错误:{e}")
+            finally:
+                self._webhook_queue.task_done()
+
+    async def _send_event(self, event: Event) -> None:
+        """
+        按配置发送事件
         """
         if self.config.enable_http_api:
-            asyncio.create_task(self.http_event(event))
-        if self.config.enable_http_webhook:
-            asyncio.create_task(self.webhook_event(event))
-        if self.config.websocekt_type != WebsocketType.Unable:
-            asyncio.create_task(self.websocket_event(event))
+            await self.http_event(event)
+        send_ws = self.config.websocekt_type != WebsocketType.Unable
+        send_webhook = self.config.enable_http_webhook
+        if not (send_ws or send_webhook):
+            return
+        # 只序列化一次，所有连接和webhook共用
+        data = event.json(by_alias=True, ensure_ascii=False, cls=DataclassEncoder)
+        if send_webhook:
+            # webhook交给单独的worker，超时的地址不会拖慢ws发送
+            try:
+                self._webhook_queue.put_nowait(data)
+            except asyncio.QueueFull:
+                log("WARNING", "webhook队列已满，丢弃事件")
+        if send_ws:
+            await self.websocket_event(data)
@@ -16,6 +16,7 @@ from wechatbot_client.com_wechat import Message, MessageHandler
 from wechatbot_client.config import Config
 from wechatbot_client.consts import FILE_CACHE
 from wechatbot_client.file_manager import FileManager
+from wechatbot_client.log import is_log_enabled
 from wechatbot_client.onebot12 import (
     BotSelf,
     BotStatus,
@@ -69,6 +70,7 @@ class WeChatManager(Adapter):
             image_path, voice_path, video_path, self.file_manager
         )
         self.action_manager.register_message_handler(self.handle_msg)
+        self.action_manager.prefetch()
         log("DEBUG", "<g>微信id获取成功...</g>")
         log("INFO", "<g>初始化完成，启动uvicorn...</g>")
 
@@ -126,11 +128,9 @@ class WeChatManager(Adapter):
         """
         处理ws请求
         """
-        echo = request.echo
-        response = await self.action_request(
-            ActionRequest(action=request.action, params=request.params)
-        )
-        return WsActionResponse(echo=echo, **response.dict())
+        response = await self.action_request(request)
+        # response已经过校验，这里直接构造，不再重复校验
+        return WsActionResponse.construct(echo=request.echo, **dict(response))
 
     async def handle_msg(self, msg: str) -> None:
         """
@@ -141,6 +141,10 @@ class WeChatManager(Adapter):
         except ValidationError as e:
             log("ERROR", f"微信消息实例化失败:{e}")
             return
+        try:
+            await self.action_manager.update_group_members(message)
+        except Exception as e:
+            log("ERROR", f"更新群成员缓存出错:{e}")
         if message.isSendMsg:
             await self.handle_self_msg(message)
         else:
@@ -167,5 +171,6 @@ class WeChatManager(Adapter):
         if event is None:
             log("DEBUG", "未生成合适事件")
             return
-        log("SUCCESS", f"生成事件<g>[{event.__repr_name__()}]</g>:{event.dict()}")
+        if is_log_enabled("SUCCESS"):
+            log("SUCCESS", f"生成事件<g>[{event.__repr_name__()}]</g>:{event.dict()}")
         await self.handle_event(event)